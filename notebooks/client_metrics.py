@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Client-side Prometheus/OpenMetrics instrumentation for the Seldon inference clients
+
+Metrics are accumulated per thread without locks and merged only when they are
+scraped, so recording a request costs well under 2 µs. Series are keyed by the
+`Seldon-Model` header value (`name` or `name.pipeline`) so they line up with the
+server-side `seldon_model_infer_*` metrics.
+
+Run `python client_metrics.py` for the overhead micro-benchmark.
+"""
+
+import sys
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+class _Series:
+    """Counters for one model or pipeline, owned by a single thread"""
+    __slots__ = (
+        "codes", "inflight", "latency_counts", "latency_sum",
+        "request_size_counts", "request_size_sum",
+        "response_size_counts", "response_size_sum",
+        "cache_hits", "cache_misses", "circuit_rejections", "circuit_trips",
+    )
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.inflight = 0
+        self.latency_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.request_size_counts = [0] * (len(SIZE_BUCKETS) + 1)
+        self.request_size_sum = 0
+        self.response_size_counts = [0] * (len(SIZE_BUCKETS) + 1)
+        self.response_size_sum = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.circuit_rejections = 0
+        self.circuit_trips = 0
+
+    def merge(self, other: "_Series"):
+        for code, count in list(other.codes.items()):
+            self.codes[code] = self.codes.get(code, 0) + count
+        self.inflight += other.inflight
+        for i, count in enumerate(other.latency_counts):
+            self.latency_counts[i] += count
+        self.latency_sum += other.latency_sum
+        for i, count in enumerate(other.request_size_counts):
+            self.request_size_counts[i] += count
+        self.request_size_sum += other.request_size_sum
+        for i, count in enumerate(other.response_size_counts):
+            self.response_size_counts[i] += count
+        self.response_size_sum += other.response_size_sum
+        self.cache_hits += other.cache_hits
+        self.cache_misses += other.cache_misses
+        self.circuit_rejections += other.circuit_rejections
+        self.circuit_trips += other.circuit_trips
+
+    def reset(self):
+        """Zero the counters; `inflight` is a live gauge and is kept"""
+        inflight = self.inflight
+        self.__init__()
+        self.inflight = inflight
+
+
+class ClientMetrics:
+    """Lock-free per-thread metrics registry with OpenMetrics exposition
+
+    Each thread writes only to its own shard; the registry lock is taken once per
+    thread (to register the shard) and on scrape. Scrapes read shards while they
+    are being written, which may skew a single scrape by an in-flight request but
+    never loses counts. Shards of exited threads (e.g. finished thread pools) are
+    folded into retired totals on the next scrape or registration, so the shard
+    list tracks live threads only.
+    """
+
+    def __init__(self, prefix: str = "seldon_client"):
+        self.prefix = prefix
+        self._local = threading.local()
+        self._shards: List[Tuple[weakref.ref, Dict[str, _Series]]] = []
+        self._retired: Dict[str, _Series] = {}
+        self._shards_lock = threading.Lock()
+
+    def _series(self, name: str) -> _Series:
+        try:
+            return self._local.shard[name]
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._retire_dead_shards()
+                self._shards.append((weakref.ref(threading.current_thread()), shard))
+        except KeyError:
+            shard = self._local.shard
+        series = shard[name] = _Series()
+        return series
+
+    def _retire_dead_shards(self):
+        """Fold shards of exited threads into the retired totals (caller holds the lock)"""
+        live = []
+        for owner, shard in self._shards:
+            thread = owner()
+            if thread is not None and thread.is_alive():
+                live.append((owner, shard))
+                continue
+            for name, series in shard.items():
+                retired = self._retired.setdefault(name, _Series())
+                retired.merge(series)
+                retired.inflight = 0  # an exited thread has nothing in flight
+        self._shards = live
+
+    def request_started(self, name: str):
+        """Mark a request to `name` as in flight"""
+        self._series(name).inflight += 1
+
+    def request_finished(self, name: str, latency: float, code="200",
+                         request_bytes: int = 0, response_bytes: int = 0):
+        """Record a completed request (latency in seconds, code as HTTP status or error kind)"""
+        series = self._series(name)
+        series.inflight -= 1
+        codes = series.codes
+        codes[code] = codes.get(code, 0) + 1
+        series.latency_counts[bisect_left(LATENCY_BUCKETS, latency)] += 1
+        series.latency_sum += latency
+        series.request_size_counts[bisect_left(SIZE_BUCKETS, request_bytes)] += 1
+        series.request_size_sum += request_bytes
+        series.response_size_counts[bisect_left(SIZE_BUCKETS, response_bytes)] += 1
+        series.response_size_sum += response_bytes
+
+    def cache_hit(self, name: str):
+        self._series(name).cache_hits += 1
+
+    def cache_miss(self, name: str):
+        self._series(name).cache_misses += 1
+
+    def circuit_rejected(self, name: str):
+        """Record a request short-circuited by an open breaker"""
+        self._series(name).circuit_rejections += 1
+
+    def circuit_tripped(self, name: str):
+        """Record a breaker transitioning from closed to open"""
+        self._series(name).circuit_trips += 1
+
+    def collect(self) -> Dict[str, _Series]:
+        """Merge all thread shards into one series per model/pipeline"""
+        merged: Dict[str, _Series] = {}
+        with self._shards_lock:
+            self._retire_dead_shards()
+            shards = [shard for _, shard in self._shards]
+            for name, series in self._retired.items():
+                merged[name] = _Series()
+                merged[name].merge(series)
+        for shard in shards:
+            for name, series in list(shard.items()):
+                if name not in merged:
+                    merged[name] = _Series()
+                merged[name].merge(series)
+        return merged
+
+    def reset(self):
+        """Zero all recorded samples, keeping the in-flight gauges of live threads"""
+        with self._shards_lock:
+            self._retired.clear()
+            for _, shard in self._shards:
+                for series in shard.values():
+                    series.reset()
+
+    def render(self) -> str:
+        """Render all metrics in the OpenMetrics text format"""
+        merged = sorted(self.collect().items())
+        p = self.prefix
+        lines: List[str] = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# TYPE {p}_{name} {kind}")
+            lines.append(f"# HELP {p}_{name} {help_text}")
+
+        def histogram(name, buckets, select):
+            for model, series in merged:
+                counts, total = select(series)
+                labels = _labels(model)
+                cumulative = 0
+                for bound, count in zip(buckets, counts):
+                    cumulative += count
+                    lines.append(f'{p}_{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                cumulative += counts[-1]
+                lines.append(f'{p}_{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+                lines.append(f"{p}_{name}_count{{{labels}}} {cumulative}")
+                lines.append(f"{p}_{name}_sum{{{labels}}} {total}")
+
+        family("infer", "counter", "Inference requests completed by the client.")
+        for model, series in merged:
+            for code, count in sorted(series.codes.items()):
+                lines.append(f'{p}_infer_total{{{_labels(model)},code="{_escape(code)}"}} {count}')
+
+        family("infer_duration_seconds", "histogram", "Client-observed inference latency.")
+        histogram("infer_duration_seconds", LATENCY_BUCKETS,
+                  lambda s: (s.latency_counts, s.latency_sum))
+
+        family("inflight_requests", "gauge", "Requests currently awaiting a response.")
+        for model, series in merged:
+            lines.append(f"{p}_inflight_requests{{{_labels(model)}}} {series.inflight}")
+
+        family("request_size_bytes", "histogram", "Serialized request payload size.")
+        histogram("request_size_bytes", SIZE_BUCKETS,
+                  lambda s: (s.request_size_counts, s.request_size_sum))
+
+        family("response_size_bytes", "histogram", "Received response payload size.")
+        histogram("response_size_bytes", SIZE_BUCKETS,
+                  lambda s: (s.response_size_counts, s.response_size_sum))
+
+        for name, attr, help_text in (
+            ("cache_hits", "cache_hits", "Requests answered from the response cache."),
+            ("cache_misses", "cache_misses", "Requests not found in the response cache."),
+            ("circuit_rejections", "circuit_rejections", "Requests rejected by an open circuit breaker."),
+            ("circuit_trips", "circuit_trips", "Circuit breaker transitions to open."),
+        ):
+            family(name, "counter", help_text)
+            for model, series in merged:
+                lines.append(f"{p}_{name}_total{{{_labels(model)}}} {getattr(series, attr)}")
+
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str):
+        """Write an OpenMetrics text snapshot to `path`"""
+        with open(path, "w") as f:
+            f.write(self.render())
+
+    def serve(self, port: int = 9464, addr: str = "0.0.0.0") -> ThreadingHTTPServer:
+        """Expose `/metrics` on a background daemon thread"""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", OPENMETRICS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((addr, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True, name="client-metrics").start()
+        return server
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(name: str) -> str:
+    """Split a Seldon-Model header value into model_name/kind labels"""
+    if name.endswith(".pipeline"):
+        return f'model_name="{_escape(name[:-len(".pipeline")])}",kind="pipeline"'
+    return f'model_name="{_escape(name)}",kind="model"'
+
+
+# Shared registry used by the notebook clients and the tester
+client_metrics = ClientMetrics()
+
+
+def benchmark(iterations: int = 200_000, threads: int = 4) -> Tuple[float, float]:
+    """Measure per-request recording overhead, single-threaded and contended"""
+    registry = ClientMetrics()
+    names = ["intent-classifier-v1", "instant-chatbot.pipeline", "product-recommender"]
+
+    def record(n):
+        for i in range(n):
+            name = names[i % 3]
+            registry.request_started(name)
+            registry.request_finished(name, 0.012, "200", 180, 420)
+
+    record(1000)  # warm up shard and series creation
+    start = time.perf_counter()
+    record(iterations)
+    single = (time.perf_counter() - start) / iterations * 1e6
+
+    workers = [threading.Thread(target=record, args=(iterations // threads,)) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    contended = (time.perf_counter() - start) / (iterations // threads * threads) * 1e6
+
+    merged = registry.collect()
+    total = sum(sum(s.codes.values()) for s in merged.values())
+    assert total == 1000 + iterations + iterations // threads * threads, "lost samples"
+    assert len(registry._shards) == 1, "worker shards not retired"
+    assert all(s.inflight == 0 for s in merged.values()), "inflight gauge drifted"
+    return single, contended
+
+
+if __name__ == "__main__":
+    single, contended = benchmark()
+    print(f"Single thread: {single:.3f} µs/request")
+    print(f"4 threads:     {contended:.3f} µs/request (wall clock, GIL-bound)")
+    budget = 2.0
+    if single < budget:
+        print(f"✅ Overhead within {budget} µs budget")
+    else:
+        print(f"❌ Overhead exceeds {budget} µs budget")
+    sys.exit(0 if single < budget else 1)
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Compressed and deduplicated payloads for large batch and monitoring requests
+
+`PayloadCompressor` compresses request bodies above a size threshold. MLServer
+only decompresses gzip request bodies, so gzip is the default; endpoints whose
+runtime also accepts zstd opt in with `allow()`. A response that rejects the
+body's encoding (`is_decode_rejection`: HTTP 415, or a 400/422 naming the
+encoding or a JSON/UTF-8 decode failure, which is what servers that cannot
+decode a body usually return) steps that endpoint down to the next encoding,
+eventually identity. Other errors, including 429 and 5xx, never downgrade.
+
+`IncrementalWindow` detects how much of a sliding window overlaps the previous
+call and ships only the appended rows, with `window_*` request parameters that a
+stateful model resolves back into the full window using `WindowState`. A
+sequence number lets the model reject out-of-order updates (HTTP 409), after
+which the client resends the full window.
+
+Run `python payload_codec.py` for the bytes-on-the-wire and latency benchmark.
+"""
+
+import gzip
+import http.client
+import json
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SUPPORTED_ENCODINGS = ("zstd", "gzip") if zstandard is not None else ("gzip",)
+ENCODINGS = ("gzip",)  # what stock MLServer decodes (mlserver/rest/requests.py)
+ACCEPT_ENCODING = "gzip"
+
+
+def compress(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3 if level is None else level).compress(body)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=1 if level is None else level)
+    return body
+
+
+def decompress(body: bytes, encoding: Optional[str]) -> bytes:
+    if not encoding or encoding == "identity":
+        return body
+    if encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd payload received but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(body, max_output_size=1 << 31)
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+_DECODE_FAILURE = re.compile(
+    r"content-encoding|json ?decode|expecting value|invalid json|codec can't decode|not valid utf-8", re.I
+)
+
+
+def is_decode_rejection(status: int, text: str, encoding: Optional[str]) -> bool:
+    """Whether an error response means the server could not decode a `encoding`-compressed body"""
+    if not encoding:
+        return False
+    if status == 415:
+        return True
+    if status not in (400, 422):
+        return False
+    return bool(_DECODE_FAILURE.search(text) or re.search(rf"\b{re.escape(encoding)}\b", text, re.I))
+
+
+class PayloadCompressor:
+    """Per-endpoint request compression with a size threshold and decode-rejection fallback"""
+
+    def __init__(self, threshold: int = 1024, encodings=ENCODINGS, level: Optional[int] = None):
+        self.threshold = threshold
+        self.encodings = [e for e in encodings if e in SUPPORTED_ENCODINGS]
+        self.level = level
+        self._endpoint_encodings: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def allow(self, endpoint: str, encodings):
+        """Set the preferred encodings for `endpoint`, e.g. ("zstd", "gzip") for runtimes that decode zstd"""
+        with self._lock:
+            self._endpoint_encodings[endpoint] = [e for e in encodings if e in SUPPORTED_ENCODINGS]
+
+    def encoding_for(self, endpoint: str) -> Optional[str]:
+        """Currently negotiated encoding for `endpoint` (None means identity)"""
+        encodings = self._endpoint_encodings.get(endpoint, self.encodings)
+        return encodings[0] if encodings else None
+
+    def encode(self, endpoint: str, body: bytes) -> Tuple[bytes, Dict[str, str]]:
+        """Compress `body` for `endpoint`, returning the wire body and headers to add"""
+        headers = {"Accept-Encoding": ACCEPT_ENCODING}
+        encoding = self.encoding_for(endpoint)
+        if encoding is None or len(body) < self.threshold:
+            return body, headers
+        headers["Content-Encoding"] = encoding
+        return compress(body, encoding, self.level), headers
+
+    def downgrade(self, endpoint: str) -> bool:
+        """Step `endpoint` down to the next encoding after a decode rejection; False once at identity"""
+        with self._lock:
+            encodings = self._endpoint_encodings.get(endpoint, self.encodings)
+            if not encodings:
+                return False
+            self._endpoint_encodings[endpoint] = encodings[1:]
+            return True
+
+
+class IncrementalWindow:
+    """Client-side state for shipping only the rows appended to a sliding window"""
+
+    def __init__(self, window_id: Optional[str] = None):
+        self.window_id = window_id or uuid.uuid4().hex
+        self.previous: Optional[np.ndarray] = None
+        self.seq = 0
+
+    def reset(self):
+        """Forget the server state so the next call ships the full window"""
+        self.previous = None
+
+    def overlap(self, window: np.ndarray) -> int:
+        """Largest m such that window[:m] equals the last m rows of the previous window"""
+        previous = self.previous
+        if previous is None or not len(previous) or not len(window) or previous.shape[1:] != window.shape[1:]:
+            return 0
+        candidates = np.flatnonzero((window == previous[-1]).reshape(len(window), -1).all(axis=1))
+        for position in candidates[::-1]:
+            m = int(position) + 1
+            if m <= len(previous) and np.array_equal(window[:m], previous[-m:]):
+                return m
+        return 0
+
+    def diff(self, window) -> Tuple[np.ndarray, Dict[str, object]]:
+        """Rows to send and the `window_*` parameters describing them"""
+        window = np.ascontiguousarray(window, dtype=np.float32)
+        m = self.overlap(window)
+        self.seq += 1
+        parameters = {
+            "window_id": self.window_id,
+            "window_seq": self.seq,
+            "window_size": len(window),
+            "window_mode": "append" if m else "full",
+        }
+        self.previous = window
+        return window[m:], parameters
+
+
+class WindowDesync(Exception):
+    """An append arrived for a window the model does not hold (respond with HTTP 409)"""
+
+
+class WindowState:
+    """Model-side reconstruction of incrementally shipped windows"""
+
+    def __init__(self, max_windows: int = 1024):
+        self.max_windows = max_windows
+        self._windows: Dict[str, Tuple[int, np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def apply(self, rows: np.ndarray, parameters: Dict[str, object]) -> np.ndarray:
+        """Return the full window for a request; stateless requests pass through"""
+        window_id = parameters.get("window_id")
+        if window_id is None:
+            return rows
+        seq, size, mode = int(parameters["window_seq"]), int(parameters["window_size"]), parameters["window_mode"]
+        with self._lock:
+            if mode == "full":
+                window = rows
+            else:
+                held = self._windows.get(window_id)
+                if held is None or held[0] != seq - 1:
+                    self._windows.pop(window_id, None)
+                    raise WindowDesync(f"window {window_id} expected seq {held[0] + 1 if held else 1}, got {seq}")
+                window = np.concatenate([held[1], rows])[-size:] if len(rows) else held[1][-size:]
+            if len(window) != size:
+                self._windows.pop(window_id, None)
+                raise WindowDesync(f"window {window_id} reconstructed {len(window)} rows, expected {size}")
+            if window_id not in self._windows and len(self._windows) >= self.max_windows:
+                self._windows.pop(next(iter(self._windows)))
+            self._windows[window_id] = (seq, window)
+        return window
+
+
+def _benchmark_server():
+    """Loopback stand-in for a stateful monitoring model"""
+    state = WindowState()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            body = decompress(self.rfile.read(int(self.headers["Content-Length"])), self.headers.get("Content-Encoding"))
+            request = json.loads(body)
+            tensor = request["inputs"][0]
+            rows = np.asarray(tensor["data"], dtype=np.float32).reshape(tensor["shape"])
+            try:
+                window = state.apply(rows, request.get("parameters", {}))
+                status, reply = 200, {"outputs": [{"name": "drift_score", "shape": [1], "datatype": "FP32",
+                                                   "data": [float(window[:, 0].mean()) if len(window) else 0.0]}]}
+            except WindowDesync as e:
+                status, reply = 409, {"error": str(e)}
+            data = json.dumps(reply).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def benchmark(sizes=(1_000, 10_000, 100_000, 1_000_000), append_fraction=0.01, features=4):
+    """Bytes on the wire and end-to-end latency per window size and payload mode"""
+    server = _benchmark_server()
+    connection = http.client.HTTPConnection("127.0.0.1", server.server_address[1])
+    rng = np.random.default_rng(0)
+    modes = [("full", None)] + [("full", encoding) for encoding in SUPPORTED_ENCODINGS] + [("incremental", "gzip")]
+    results = []
+
+    for size in sizes:
+        ticks = 4 if size < 1_000_000 else 2
+        step = max(1, int(size * append_fraction))
+        stream = rng.normal(size=(size + step * (ticks + 1), features)).astype(np.float32)
+        for mode, encoding in modes:
+            compressor = PayloadCompressor(encodings=[encoding] if encoding else [])
+            window_state = IncrementalWindow() if mode == "incremental" else None
+            wire, latencies = [], []
+            for tick in range(ticks + 1):
+                window = stream[tick * step:tick * step + size]
+                start = time.perf_counter()
+                payload = {"inputs": [{"name": "predict", "datatype": "FP32"}]}
+                rows = window
+                if window_state is not None:
+                    rows, payload["parameters"] = window_state.diff(window)
+                payload["inputs"][0].update(shape=list(rows.shape), data=rows.ravel().tolist())
+                body, headers = compressor.encode("/v2/models/drift-detector/infer", json.dumps(payload).encode())
+                headers["Content-Type"] = "application/json"
+                connection.request("POST", "/v2/models/drift-detector/infer", body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                assert response.status == 200, response.status
+                if tick:  # first tick primes the incremental window
+                    latencies.append(time.perf_counter() - start)
+                    wire.append(len(body))
+            results.append({
+                "rows": size,
+                "mode": mode if mode == "incremental" else f"full/{encoding or 'identity'}",
+                "bytes": int(np.median(wire)),
+                "latency_ms": float(np.median(latencies)) * 1000,
+            })
+    connection.close()
+    server.shutdown()
+    return results
+
+
+if __name__ == "__main__":
+    sizes = tuple(int(s) for s in sys.argv[1].split(",")) if len(sys.argv) > 1 else (1_000, 10_000, 100_000, 1_000_000)
+    print(f"{'rows':>9} {'mode':<16} {'bytes on wire':>14} {'latency':>11}")
+    baseline = {}
+    for result in benchmark(sizes):
+        baseline.setdefault(result["rows"], result["bytes"])
+        ratio = baseline[result["rows"]] / max(result["bytes"], 1)
+        print(f"{result['rows']:>9,} {result['mode']:<16} {result['bytes']:>14,} "
+              f"{result['latency_ms']:>9.1f}ms  ({ratio:,.0f}x smaller)")
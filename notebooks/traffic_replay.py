@@ -0,0 +1,611 @@
+#!/usr/bin/env python3
+"""
+Record-and-replay traffic capture for reproducing production tail latency
+
+`TrafficRecorder` appends time-stamped request records (user, Seldon-Model, headers,
+JSON body, observed latency, status) to a gzip-compressed binary log. Repeated
+strings (models, users, header sets) are written once and referenced by id.
+
+`TrafficReplayer` re-issues a capture at 1x/Nx speed, preserving inter-arrival
+gaps and per-user ordering. One asyncio dispatcher starts every request at its
+scheduled time; a user's request first awaits that user's previous response, so
+ordering holds without other users queueing behind it. `HttpSender` posts over a
+pool of keep-alive HTTP/1.1 connections, and `replay_file` shards users across
+processes (one per core) when a single interpreter cannot keep up.
+
+A sender process costs roughly 90 µs of CPU per request, so one core replays
+about 10k req/s; tens of thousands of req/s need `processes` on several cores.
+
+Run `python traffic_replay.py [rate] [processes]` for the scheduler and loopback
+HTTP benchmarks (default 20k req/s); it fails unless the HTTP replay holds `rate`
+with at most 50ms p99 lateness.
+"""
+
+import asyncio
+import gzip
+import inspect
+import json
+import multiprocessing
+import operator
+import os
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+
+MAGIC = b"SCRR1\n"
+_STRING = struct.Struct("<BIH")  # kind, string id, byte length
+_REQUEST = struct.Struct("<BdfHIIII")  # kind, timestamp, latency, status, model, user, headers, body length
+_KIND_STRING = 0
+_KIND_REQUEST = 1
+
+
+class TrafficRecord(NamedTuple):
+    timestamp: float  # wall-clock send time (seconds since epoch)
+    user: str
+    model: str  # Seldon-Model header value, e.g. "iris" or "instant-chatbot.pipeline"
+    headers: Dict[str, str]
+    body: bytes
+    latency: float  # observed latency in seconds
+    status: int  # HTTP status, 0 for transport errors
+
+
+class TrafficRecorder:
+    """Thread-safe append-only writer for compressed capture logs"""
+
+    def __init__(self, path: str, compresslevel: int = 6):
+        self.path = path
+        self._file = gzip.open(path, "wb", compresslevel=compresslevel)
+        self._file.write(MAGIC)
+        self._strings: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def _intern(self, value: str) -> int:
+        sid = self._strings.get(value)
+        if sid is None:
+            sid = self._strings[value] = len(self._strings)
+            data = value.encode()
+            self._file.write(_STRING.pack(_KIND_STRING, sid, len(data)) + data)
+        return sid
+
+    def record(self, user: Optional[str], model: str, headers: Dict[str, str], body,
+               latency: float, status: int, timestamp: Optional[float] = None):
+        """Append one request; `body` is the serialized JSON payload (str or bytes)"""
+        if isinstance(body, str):
+            body = body.encode()
+        header_key = json.dumps(headers, sort_keys=True)
+        with self._lock:
+            if self._file is None:
+                return
+            entry = _REQUEST.pack(
+                _KIND_REQUEST, time.time() if timestamp is None else timestamp, latency, status,
+                self._intern(model), self._intern(user or ""), self._intern(header_key), len(body)
+            )
+            self._file.write(entry + body)
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_records(path: str) -> Iterator[TrafficRecord]:
+    """Stream records from a capture log in recorded order"""
+    strings: Dict[int, str] = {}
+    headers_cache: Dict[int, Dict[str, str]] = {}
+    with gzip.open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a traffic capture log")
+        while True:
+            kind = f.read(1)
+            if not kind:
+                return
+            if kind[0] == _KIND_STRING:
+                _, sid, length = _STRING.unpack(kind + f.read(_STRING.size - 1))
+                strings[sid] = f.read(length).decode()
+            elif kind[0] == _KIND_REQUEST:
+                _, ts, latency, status, model, user, headers, length = _REQUEST.unpack(
+                    kind + f.read(_REQUEST.size - 1)
+                )
+                if headers not in headers_cache:
+                    headers_cache[headers] = json.loads(strings[headers])
+                yield TrafficRecord(ts, strings[user], strings[model], headers_cache[headers],
+                                    f.read(length), latency, status)
+            else:
+                raise ValueError(f"Corrupt capture log {path}: unknown record kind {kind[0]}")
+
+
+class HttpSender:
+    """Picklable async sender posting records to a Seldon gateway
+
+    Requests go over a per-process pool of keep-alive HTTP/1.1 connections opened
+    on demand up to `max_connections`; a pooled connection the server has closed
+    is retried once on a fresh one. Returns the HTTP status, or 0 for transport
+    errors and timeouts.
+    """
+
+    def __init__(self, gateway_ip: str, gateway_port: str = "80", timeout: float = 30,
+                 max_connections: int = 2048):
+        self.host = gateway_ip
+        self.port = int(gateway_port)
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._loop = None
+
+    def __getstate__(self):
+        return {"host": self.host, "port": self.port, "timeout": self.timeout,
+                "max_connections": self.max_connections, "_loop": None}
+
+    def _request_head(self, record: TrafficRecord) -> bytes:
+        model = record.model[:-len(".pipeline")] if record.model.endswith(".pipeline") else record.model
+        host = f"{self.host}:{self.port}"
+        lines = [f"POST /v2/models/{model}/infer HTTP/1.1"]
+        for name, value in record.headers.items():
+            if name.lower() == "host":
+                host = value
+            elif name.lower() not in ("content-length", "connection", "transfer-encoding"):
+                lines.append(f"{name}: {value}")
+        lines += [f"Host: {host}", f"Content-Length: {len(record.body)}", "", ""]
+        return "\r\n".join(lines).encode()
+
+    async def _acquire(self, loop) -> "_HttpConnection":
+        """Idle pooled connection, else a new one within `max_connections`, else wait for one"""
+        if self._loop is not loop:
+            self._loop, self._idle, self._waiters, self._open = loop, [], deque(), 0
+        while self._idle:
+            connection = self._idle.pop()
+            if not connection.closed:
+                return connection
+            self._open -= 1
+        if self._open >= self.max_connections:
+            waiter = loop.create_future()
+            self._waiters.append(waiter)
+            connection = await waiter
+            if connection is not None:
+                return connection
+        else:
+            self._open += 1
+        try:
+            _, connection = await asyncio.wait_for(
+                loop.create_connection(_HttpConnection, self.host, self.port), self.timeout)
+        except BaseException:
+            self._release(None)
+            raise
+        return connection
+
+    def _release(self, connection: Optional["_HttpConnection"]):
+        """Hand a connection (or, for None, its slot) to the next waiter, else back to the pool"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(connection)
+                return
+        if connection is not None:
+            self._idle.append(connection)
+        else:
+            self._open -= 1
+
+    def close(self):
+        """Close pooled connections (called by `TrafficReplayer` when a replay ends)"""
+        if self._loop is not None:
+            for connection in self._idle:
+                connection.transport.close()
+            self._loop = None
+
+    async def __call__(self, record: TrafficRecord) -> int:
+        loop = asyncio.get_running_loop()
+        request = self._request_head(record) + record.body
+        for attempt in range(2):
+            try:
+                connection = await self._acquire(loop)
+            except (OSError, asyncio.TimeoutError):
+                return 0
+            reused = connection.requests > 0
+            timer = loop.call_later(self.timeout, connection.abort)
+            try:
+                status, keep_alive = await connection.request(request)
+            except (OSError, ValueError):
+                self._release(None)
+                if reused and not connection.received and not connection.timed_out:
+                    continue  # the server closed an idle keep-alive connection
+                return 0
+            finally:
+                timer.cancel()
+            if keep_alive:
+                self._release(connection)
+            else:
+                connection.transport.close()
+                self._release(None)
+            return status
+        return 0
+
+
+class _HttpConnection(asyncio.Protocol):
+    """One keep-alive HTTP/1.1 client connection with a single request in flight"""
+
+    def __init__(self):
+        self.transport = None
+        self.waiter = None
+        self.buffer = bytearray()
+        self.requests = 0
+        self.received = False
+        self.closed = False
+        self.timed_out = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+        sock = transport.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def connection_lost(self, exc):
+        self.closed = True
+        if self.waiter is not None and not self.waiter.done():
+            response = _parse_response(self.buffer, eof=True) if self.received else None
+            if response is not None:
+                self.waiter.set_result(response)
+            else:
+                self.waiter.set_exception(ConnectionResetError("connection closed before the response completed"))
+
+    def abort(self):
+        self.timed_out = True
+        self.transport.abort()
+
+    def request(self, data: bytes) -> asyncio.Future:
+        """Send `data`; the future resolves to (status, connection reusable)"""
+        self.requests += 1
+        self.received = False
+        self.buffer.clear()
+        self.waiter = asyncio.get_running_loop().create_future()
+        self.transport.write(data)
+        return self.waiter
+
+    def data_received(self, data):
+        self.received = True
+        self.buffer += data
+        try:
+            response = _parse_response(self.buffer)
+        except ValueError as e:
+            self.waiter.set_exception(e)
+            self.transport.abort()
+            return
+        if response is not None and not self.waiter.done():
+            self.waiter.set_result(response)
+
+
+def _parse_response(buffer: bytearray, eof: bool = False):
+    """(status, keep_alive) once `buffer` holds a complete HTTP/1.x response, else None"""
+    end = buffer.find(b"\r\n\r\n")
+    if end < 0:
+        return None
+    lines = bytes(buffer[:end]).split(b"\r\n")
+    version, status = lines[0].split(b" ", 2)[:2]
+    keep_alive = version == b"HTTP/1.1"
+    length, chunked = None, False
+    for line in lines[1:]:
+        name, _, value = line.partition(b":")
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == b"content-length":
+            length = int(value)
+        elif name == b"transfer-encoding":
+            chunked = b"chunked" in value
+        elif name == b"connection":
+            keep_alive = value == b"keep-alive" or (keep_alive and value != b"close")
+    position = end + 4
+    if chunked:
+        while True:
+            line_end = buffer.find(b"\r\n", position)
+            if line_end < 0:
+                return None
+            size = int(bytes(buffer[position:line_end]).split(b";")[0], 16)
+            position = line_end + 2
+            if size == 0:
+                return (int(status), keep_alive) if buffer.find(b"\r\n\r\n", position - 2) >= 0 else None
+            position += size + 2
+            if len(buffer) < position:
+                return None
+    if length is None:
+        return (int(status), False) if eof else None  # body delimited by connection close
+    return (int(status), keep_alive) if len(buffer) >= position + length else None
+
+
+@dataclass
+class ReplayResult:
+    recorded_latencies: List[float] = field(default_factory=list)
+    replayed_latencies: List[float] = field(default_factory=list)
+    lateness: List[float] = field(default_factory=list)  # seconds behind schedule at send time
+    statuses: Dict[int, int] = field(default_factory=dict)
+    duration: float = 0.0
+
+    def merge(self, other: "ReplayResult"):
+        self.recorded_latencies.extend(other.recorded_latencies)
+        self.replayed_latencies.extend(other.replayed_latencies)
+        self.lateness.extend(other.lateness)
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+        self.duration = max(self.duration, other.duration)
+
+    def summary(self) -> Dict[str, float]:
+        """Throughput, schedule lag and recorded-vs-replayed latency comparison"""
+        count = len(self.replayed_latencies)
+        summary = {
+            "requests": count,
+            "duration": self.duration,
+            "throughput": count / self.duration if self.duration else 0.0,
+            "success_rate": self.statuses.get(200, 0) / count * 100 if count else 0.0,
+            "p99_lateness_ms": _percentile(self.lateness, 99) * 1000,
+        }
+        summary.update(compare_latency(self.recorded_latencies, self.replayed_latencies))
+        return summary
+
+
+class TrafficReplayer:
+    """Re-issue records on their recorded schedule, scaled by `speed`
+
+    `send` is an async callable such as `HttpSender`, or a plain non-blocking
+    function. Each request starts at its scheduled time unless the same user's
+    previous request is still awaiting its response; `lateness` reports how far
+    behind the schedule each send was. Gaps shorter than `min_sleep` are not
+    slept, which keeps dispatch cheap at high rates.
+    """
+
+    def __init__(self, send: Callable[[TrafficRecord], int], speed: float = 1.0,
+                 min_sleep: float = 0.0005):
+        self.send = send
+        self.speed = speed
+        self.min_sleep = min_sleep
+
+    def run(self, records: List[TrafficRecord], start_at: Optional[float] = None,
+            origin: Optional[float] = None) -> ReplayResult:
+        """Replay `records`; `start_at`/`origin` align shards replayed by other processes"""
+        if not records:
+            return ReplayResult()
+        coroutine = self._run(records, start_at, origin)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coroutine)
+        # Already inside an event loop (e.g. Jupyter): replay on a separate thread
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            return executor.submit(asyncio.run, coroutine).result()
+
+    async def _run(self, records, start_at, origin) -> ReplayResult:
+        # Records are logged on completion, so concurrent users' sends can be out of order
+        records = sorted(records, key=operator.attrgetter("timestamp"))
+        if origin is None:
+            origin = records[0].timestamp
+        if start_at is None:
+            start_at = time.time() + 0.05
+        loop = asyncio.get_running_loop()
+        clock, sleep, create_task = loop.time, asyncio.sleep, loop.create_task
+        start = clock() + (start_at - time.time())
+        speed, min_sleep, send = self.speed, self.min_sleep, self.send
+        is_async = inspect.iscoroutinefunction(send) or inspect.iscoroutinefunction(getattr(send, "__call__", None))
+        recorded, replayed, lateness, statuses = [], [], [], {}
+
+        def observe(record, due, sent, status):
+            replayed.append(clock() - sent)
+            recorded.append(record.latency)
+            lateness.append(max(sent - due, 0.0))
+            statuses[status] = statuses.get(status, 0) + 1
+
+        async def issue(record, due, previous):
+            if previous is not None:
+                await previous
+            sent = clock()
+            observe(record, due, sent, await send(record))
+
+        last: Dict[str, asyncio.Task] = {}
+        for record in records:
+            due = start + (record.timestamp - origin) / speed
+            delay = due - clock()
+            if delay > min_sleep:
+                await sleep(delay)
+            if not is_async:
+                sent = clock()
+                observe(record, due, sent, send(record))
+                continue
+            previous = last.get(record.user)
+            if previous is not None and previous.done():
+                previous = None
+            last[record.user] = create_task(issue(record, due, previous))
+        if last:
+            await asyncio.gather(*last.values())
+        close = getattr(send, "close", None)
+        if close is not None:
+            close()
+
+        return ReplayResult(recorded, replayed, lateness, statuses, clock() - start)
+
+
+def shard_of(user: str, shards: int) -> int:
+    """Stable user -> process assignment (identical across processes)"""
+    return zlib.crc32(user.encode()) % shards
+
+
+def _replay_shard(path, shard, shards, send, speed, start_at, origin):
+    records = [r for r in read_records(path) if shard_of(r.user, shards) == shard]
+    return TrafficReplayer(send, speed).run(records, start_at, origin)
+
+
+def replay_file(path: str, send: Callable[[TrafficRecord], int], speed: float = 1.0,
+                processes: int = 1) -> ReplayResult:
+    """Replay a capture log, sharding users across `processes` for high request rates"""
+    if processes <= 1:
+        return TrafficReplayer(send, speed).run(list(read_records(path)))
+    origin = min(r.timestamp for r in read_records(path))
+    # Leave time for every process to load its shard before the first send
+    start_at = time.time() + 1.0 + os.path.getsize(path) / 20e6
+    result = ReplayResult()
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [
+            executor.submit(_replay_shard, path, shard, processes, send, speed, start_at, origin)
+            for shard in range(processes)
+        ]
+        for future in futures:
+            result.merge(future.result())
+    return result
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def compare_latency(recorded: List[float], replayed: List[float]) -> Dict[str, float]:
+    """Percentile deltas (ms) and Kolmogorov-Smirnov distance between two latency samples"""
+    comparison = {}
+    for pct in (50, 95, 99):
+        before, after = _percentile(recorded, pct) * 1000, _percentile(replayed, pct) * 1000
+        comparison[f"recorded_p{pct}_ms"] = before
+        comparison[f"replayed_p{pct}_ms"] = after
+        comparison[f"delta_p{pct}_ms"] = after - before
+
+    # Two-sample KS statistic: max gap between the empirical CDFs
+    a, b = sorted(recorded), sorted(replayed)
+    i = j = 0
+    ks = 0.0
+    while i < len(a) and j < len(b):
+        # Step past every copy of the next value in both samples before comparing
+        value = min(a[i], b[j])
+        while i < len(a) and a[i] == value:
+            i += 1
+        while j < len(b) and b[j] == value:
+            j += 1
+        ks = max(ks, abs(i / len(a) - j / len(b)))
+    comparison["ks_distance"] = ks
+    return comparison
+
+
+class _BenchmarkServer(asyncio.Protocol):
+    """Loopback stand-in for the gateway answering every request after a fixed latency"""
+
+    body = b'{"outputs":[{"name":"output","shape":[1],"datatype":"FP32","data":[0.0]}]}'
+    reply = b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body)
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.buffer = b""
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.loop = asyncio.get_running_loop()
+
+    def data_received(self, data):
+        self.buffer += data
+        while True:
+            end = self.buffer.find(b"\r\n\r\n")
+            if end < 0:
+                return
+            head = self.buffer[:end].lower()
+            marker = head.find(b"content-length:")
+            length = int(head[marker + 15:].split(b"\r\n", 1)[0]) if marker >= 0 else 0
+            if len(self.buffer) < end + 4 + length:
+                return
+            self.buffer = self.buffer[end + 4 + length:]
+            self.loop.call_later(self.latency, self._respond)
+
+    def _respond(self):
+        if not self.transport.is_closing():
+            self.transport.write(self.reply)
+
+
+def _benchmark_server(latency: float, ports):
+    async def serve():
+        server = await asyncio.get_running_loop().create_server(
+            lambda: _BenchmarkServer(latency), "127.0.0.1", 0, backlog=4096)
+        ports.put(server.sockets[0].getsockname()[1])
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+def _write_capture(path: str, requests_count: int, rate: float, users: int, latency: float):
+    body = json.dumps({"inputs": [{"name": "text", "shape": [1, 4], "datatype": "FP32",
+                                   "data": [[27.0, 5.0, 83.0, 48.0]]}]})
+    headers = {"Content-Type": "application/json", "Seldon-Model": "instant-chatbot.pipeline"}
+    origin = time.time()
+    with TrafficRecorder(path) as recorder:
+        for i in range(requests_count):
+            recorder.record(f"user_{i % users}", "instant-chatbot.pipeline", headers, body,
+                            latency + (i % 50) / 1000, 200, timestamp=origin + i / rate)
+
+
+def benchmark(requests_count: int = 200_000, rate: float = 40_000, users: int = 5_000):
+    """Record a synthetic capture at `rate` req/s, then replay it against a no-op sender
+
+    This measures recorder/reader throughput and whether the scheduler holds the
+    recorded rate; `benchmark_http` measures what a real sender sustains.
+    """
+    path = os.path.join(tempfile.mkdtemp(), "capture.bin.gz")
+    start = time.perf_counter()
+    _write_capture(path, requests_count, rate, users, 0.02)
+    record_rate = requests_count / (time.perf_counter() - start)
+    size = os.path.getsize(path)
+
+    start = time.perf_counter()
+    records = list(read_records(path))
+    read_rate = len(records) / (time.perf_counter() - start)
+
+    result = TrafficReplayer(lambda record: 200, speed=1.0).run(records)
+    return record_rate, read_rate, size / requests_count, result.summary()
+
+
+def benchmark_http(requests_count: int = 200_000, rate: float = 20_000, users: int = 5_000,
+                   latency: float = 0.02, processes: int = 1):
+    """Replay a capture with `HttpSender` against a loopback server that answers after `latency`
+
+    The server runs in its own process so it does not compete with the replayer
+    for the interpreter lock.
+    """
+    ports = multiprocessing.Queue()
+    server = multiprocessing.Process(target=_benchmark_server, args=(latency, ports), daemon=True)
+    server.start()
+    path = os.path.join(tempfile.mkdtemp(), "capture.bin.gz")
+    _write_capture(path, requests_count, rate, users, latency)
+    sender = HttpSender("127.0.0.1", str(ports.get(timeout=10)))
+    try:
+        return replay_file(path, sender, speed=1.0, processes=processes).summary()
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    rate = float(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    # Leave half the cores to the loopback server
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else max(1, (os.cpu_count() or 1) // 2)
+    record_rate, read_rate, bytes_per_record, summary = benchmark()
+    print(f"Record:  {record_rate:,.0f} records/s ({bytes_per_record:.1f} bytes/record compressed)")
+    print(f"Read:    {read_rate:,.0f} records/s")
+    print(f"Replay:  {summary['throughput']:,.0f} req/s scheduled against a no-op sender "
+          f"(p99 lateness {summary['p99_lateness_ms']:.1f}ms)")
+    http = benchmark_http(requests_count=int(rate * 10), rate=rate, processes=processes)
+    print(f"HTTP:    {http['throughput']:,.0f} req/s of {rate:,.0f} recorded over loopback "
+          f"({processes} process(es), 20ms responses, p99 lateness {http['p99_lateness_ms']:.1f}ms, "
+          f"success {http['success_rate']:.1f}%)")
+    passed = (http["throughput"] >= 0.9 * rate and http["p99_lateness_ms"] <= 50
+              and http["success_rate"] >= 99.9)
+    print(f"{'✅' if passed else '❌'} HTTP replay {'holds' if passed else 'does not hold'} "
+          f"{rate:,.0f} req/s (needs ≥90% throughput, p99 lateness ≤50ms, ≥99.9% success)")
+    sys.exit(0 if passed else 1)
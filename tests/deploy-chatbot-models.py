@@ -6,6 +6,10 @@ Deploy missing chatbot models from chatbot_mlops_showcase.ipynb
 import subprocess
 import json
 import time
+import os
+import re
+
+DEPLOYMENTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "deployments")
 
 def run(cmd, timeout=30):
     """Execute command"""
@@ -15,6 +19,16 @@ def run(cmd, timeout=30):
     except Exception as e:
         return subprocess.CompletedProcess(cmd, 1, "", str(e))
 
+def declared_memory(name, default):
+    """Memory from deployments/<name>.yaml (kept current by rightsize-model-memory.py)"""
+    path = os.path.join(DEPLOYMENTS_DIR, f"{name}.yaml")
+    if os.path.exists(path):
+        with open(path) as f:
+            match = re.search(r"^  memory:\s*(\S+)", f.read(), re.M)
+        if match:
+            return match.group(1)
+    return default
+
 def deploy_model(model_config):
     """Deploy a single model"""
     model_yaml = f"""apiVersion: mlops.seldon.io/v1alpha1
@@ -59,9 +73,9 @@ spec:
 
 # Chatbot models to deploy
 chatbot_models = [
-    {"name": "intent-classifier-v1", "memory": "500Mi"},
-    {"name": "entity-extractor", "memory": "1Gi"},
-    {"name": "product-recommender", "memory": "1Gi"},
+    {"name": "intent-classifier-v1", "memory": declared_memory("intent-classifier-v1", "500Mi")},
+    {"name": "entity-extractor", "memory": declared_memory("entity-extractor", "1Gi")},
+    {"name": "product-recommender", "memory": declared_memory("product-recommender", "1Gi")},
 ]
 
 # Deploy pipelines
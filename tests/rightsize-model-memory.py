@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+"""
+Right-size Model `memory` declarations from observed memory usage
+
+Loads each Model artifact declared in deployments/ into a local MLServer process,
+drives inference at several batch sizes while sampling process-tree RSS, and
+recommends `memory` values (peak over an empty-server baseline, plus headroom).
+Writes a report with the node packing density gained and, with --write, updates
+the manifests in place.
+
+Usage:
+    python tests/rightsize-model-memory.py                      # profile and report
+    python tests/rightsize-model-memory.py --write              # also update deployments/*.yaml
+    python tests/rightsize-model-memory.py --models intent-classifier-v1 --batch-sizes 1,32
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import concurrent.futures
+from datetime import datetime
+
+import requests
+
+DEPLOYMENTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "deployments")
+
+# MLServer runtimes for the `requirements` used by Seldon Core 2 server capabilities
+IMPLEMENTATIONS = {
+    "sklearn": "mlserver_sklearn.SKLearnModel",
+    "scikit-learn": "mlserver_sklearn.SKLearnModel",
+    "xgboost": "mlserver_xgboost.XGBoostModel",
+    "lightgbm": "mlserver_lightgbm.LightGBMModel",
+    "mlflow": "mlserver_mlflow.MLflowRuntime",
+}
+
+UNITS = {"Ki": 2**10, "Mi": 2**20, "Gi": 2**30, "Ti": 2**40, "k": 10**3, "M": 10**6, "G": 10**9, "T": 10**12}
+MI = 2**20
+
+
+def run(cmd, timeout=600):
+    """Execute command with timeout and error handling"""
+    try:
+        return subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return subprocess.CompletedProcess(cmd, 1, "", f"Command timed out after {timeout}s")
+    except Exception as e:
+        return subprocess.CompletedProcess(cmd, 1, "", str(e))
+
+
+def log(msg, level="INFO"):
+    """Log with timestamp"""
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    icons = {"INFO": "ℹ️", "SUCCESS": "✅", "WARNING": "⚠️", "ERROR": "❌"}
+    print(f"{icons.get(level, '📝')} [{timestamp}] {msg}")
+
+
+def parse_quantity(value):
+    """Kubernetes memory quantity ("500Mi", "1Gi", "1G", "1048576") to bytes"""
+    match = re.fullmatch(r"\s*([0-9.]+)\s*([KMGT]i|[kMGT])?\s*", str(value))
+    if not match:
+        raise ValueError(f"Invalid memory quantity: {value}")
+    return int(float(match.group(1)) * UNITS.get(match.group(2), 1))
+
+
+def format_quantity(n_bytes):
+    """Bytes to the manifest style: whole Gi when exact, otherwise Mi"""
+    if n_bytes % 2**30 == 0:
+        return f"{n_bytes // 2**30}Gi"
+    return f"{math.ceil(n_bytes / MI)}Mi"
+
+
+def load_manifests(directory, default_memory):
+    """Collect Model resources (one entry per manifest document) from deployments/"""
+    models = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.yaml"))):
+        with open(path) as f:
+            documents = re.split(r"\n---\n", f.read())
+        for doc in documents:
+            if not re.search(r"^kind:\s*Model\s*$", doc, re.M):
+                continue
+            declared = manifest_field(doc, "memory")
+            requirements = re.search(r"^  requirements:\s*\n((?:\s*- .*(?:\n|$))+)", doc, re.M)
+            models.append({
+                "path": path,
+                "name": manifest_field(doc, "name"),
+                "storage_uri": manifest_field(doc, "storageUri"),
+                "requirements": re.findall(r"- \s*['\"]?([^'\"\s]+)", requirements.group(1)) if requirements else [],
+                "declared": parse_quantity(declared) if declared else None,
+                "effective": parse_quantity(declared) if declared else default_memory,
+            })
+    return models
+
+
+def manifest_field(doc, key):
+    """Value of a two-space-indented `key:` (metadata/spec level) in a manifest document"""
+    match = re.search(rf"^  {key}:\s*['\"]?([^'\"\s#]+)", doc, re.M)
+    return match.group(1) if match else None
+
+
+def fetch_artifact(storage_uri, cache_dir):
+    """Download (once) a model artifact to a local directory"""
+    if os.path.isdir(storage_uri):
+        return storage_uri
+    local = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", storage_uri))
+    if os.path.isdir(local):
+        return local
+    os.makedirs(local)
+    if storage_uri.startswith("gs://"):
+        result = run(f"gsutil -m cp -r '{storage_uri.rstrip('/')}/*' '{local}'")
+    elif storage_uri.startswith("s3://"):
+        result = run(f"aws s3 cp --recursive '{storage_uri}' '{local}'")
+    else:
+        raise RuntimeError(f"Unsupported storageUri: {storage_uri}")
+    if result.returncode != 0:
+        shutil.rmtree(local, ignore_errors=True)
+        raise RuntimeError(f"Failed to fetch {storage_uri}: {result.stderr.strip()[:200]}")
+    return local
+
+
+def prepare_repository(model, artifact_dir, repository):
+    """Lay out a single-model MLServer repository named after the Model resource"""
+    model_dir = os.path.join(repository, model["name"])
+    shutil.copytree(artifact_dir, model_dir)
+    settings_path = os.path.join(model_dir, "model-settings.json")
+    if os.path.exists(settings_path):
+        with open(settings_path) as f:
+            settings = json.load(f)
+    else:
+        runtime = next((IMPLEMENTATIONS[r] for r in model["requirements"] if r in IMPLEMENTATIONS), None)
+        if runtime is None:
+            raise RuntimeError(f"No model-settings.json and no known runtime for {model['requirements']}")
+        settings = {"implementation": runtime, "parameters": {"uri": "./"}}
+    settings["name"] = model["name"]
+    with open(settings_path, "w") as f:
+        json.dump(settings, f, indent=2)
+
+
+def tree_rss(pid):
+    """Resident set size of a process and all its descendants, in bytes"""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+    return total
+
+
+class MemorySampler(threading.Thread):
+    """Background sampler tracking current and peak process-tree RSS"""
+
+    def __init__(self, pid, interval=0.05):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.current = 0
+        self.peak = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.current = tree_rss(self.pid)
+            self.peak = max(self.peak, self.current)
+            time.sleep(self.interval)
+
+    def reset_peak(self):
+        self.peak = self.current
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class LocalMLServer:
+    """MLServer subprocess serving a local model repository"""
+
+    def __init__(self, repository, parallel_workers=1):
+        self.repository = repository
+        self.http_port = free_port()
+        self.env = dict(
+            os.environ,
+            MLSERVER_HTTP_PORT=str(self.http_port),
+            MLSERVER_GRPC_PORT=str(free_port()),
+            MLSERVER_METRICS_PORT=str(free_port()),
+            MLSERVER_PARALLEL_WORKERS=str(parallel_workers),
+        )
+        self.url = f"http://127.0.0.1:{self.http_port}"
+        self.process = None
+        self.sampler = None
+
+    def start(self, model_name=None, timeout=300):
+        """Start the server and return seconds until it (and `model_name`) is ready"""
+        start_time = time.time()
+        self.process = subprocess.Popen(
+            ["mlserver", "start", self.repository], env=self.env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        self.sampler = MemorySampler(self.process.pid)
+        self.sampler.start()
+        ready_url = f"{self.url}/v2/models/{model_name}/ready" if model_name else f"{self.url}/v2/health/ready"
+        while time.time() - start_time < timeout:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"MLServer exited with code {self.process.returncode}")
+            try:
+                if requests.get(ready_url, timeout=1).status_code == 200:
+                    return time.time() - start_time
+            except requests.exceptions.RequestException:
+                pass
+            time.sleep(0.2)
+        raise RuntimeError(f"MLServer not ready after {timeout}s")
+
+    def settle(self, seconds=2.0):
+        """Let RSS settle and return the steady-state value"""
+        time.sleep(seconds)
+        return self.sampler.current
+
+    def stop(self):
+        if self.sampler:
+            self.sampler.stop()
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def drive_load(server, model_name, batch_size, requests_count, features, concurrency):
+    """Send `requests_count` FP32 [batch_size, features] requests, returning the success count"""
+    session = requests.Session()
+    url = f"{server.url}/v2/models/{model_name}/infer"
+    row = [5.1, 3.5, 1.4, 0.2] * (features // 4 + 1)
+    payload = json.dumps({
+        "inputs": [{
+            "name": "predict",
+            "shape": [batch_size, features],
+            "datatype": "FP32",
+            "data": [row[:features]] * batch_size
+        }]
+    })
+
+    def send(_):
+        try:
+            response = session.post(url, data=payload, headers={"Content-Type": "application/json"}, timeout=30)
+            return response.status_code == 200
+        except requests.exceptions.RequestException:
+            return False
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return sum(executor.map(send, range(requests_count)))
+
+
+def profile_baseline(workdir, args):
+    """RSS of an MLServer with an empty repository"""
+    repository = tempfile.mkdtemp(dir=workdir)
+    with LocalMLServer(repository, args.parallel_workers) as server:
+        server.start()
+        return server.settle()
+
+
+def profile_model(model, artifact_dir, workdir, baseline, args):
+    """Load one model, drive each batch size, and record load time and memory
+
+    The peak covers model loading as well as inference: a model declared below
+    its load-time spike is OOM-killed on every reload. Raises if any batch size
+    falls below `--min-success`, since failed requests only measure idle memory.
+    """
+    repository = tempfile.mkdtemp(dir=workdir)
+    prepare_repository(model, artifact_dir, repository)
+    with LocalMLServer(repository, args.parallel_workers) as server:
+        load_time = server.start(model["name"])
+        idle = server.settle()
+        load_peak = server.sampler.peak
+        batches = {}
+        for batch_size in args.batch_sizes:
+            server.sampler.reset_peak()
+            ok = drive_load(server, model["name"], batch_size, args.requests, args.features, args.concurrency)
+            time.sleep(server.sampler.interval * 2)
+            if ok < args.requests * args.min_success:
+                raise RuntimeError(f"batch size {batch_size}: only {ok}/{args.requests} requests succeeded "
+                                   f"(check --features and the model's input)")
+            batches[batch_size] = {"peak": server.sampler.peak, "success": ok}
+        peak = max([load_peak] + [b["peak"] for b in batches.values()])
+    return {
+        "load_time": load_time,
+        "idle": max(idle - baseline, 0),
+        "load_peak": max(load_peak - baseline, 0),
+        "peak": max(peak - baseline, 0),
+        "batches": {size: dict(b, peak=max(b["peak"] - baseline, 0)) for size, b in batches.items()},
+    }
+
+
+def recommend(peak, headroom, step):
+    """Peak model memory plus headroom, rounded up to `step` bytes"""
+    return max(step, math.ceil(peak * (1 + headroom) / step) * step)
+
+
+def nodes_needed(sizes, capacity):
+    """First-fit-decreasing bin packing of model memory onto nodes"""
+    nodes = []
+    for size in sorted(sizes, reverse=True):
+        for i, free in enumerate(nodes):
+            if size <= free:
+                nodes[i] -= size
+                break
+        else:
+            nodes.append(capacity - size)
+    return len(nodes)
+
+
+def write_memory(path, name, quantity):
+    """Set `spec.memory` for Model `name` in a manifest, preserving the rest of the file"""
+    with open(path) as f:
+        text = f.read()
+    documents = re.split(r"(\n---\n)", text)
+    for i, doc in enumerate(documents):
+        if not re.search(r"^kind:\s*Model\s*$", doc, re.M) or not re.search(rf"^  name:\s*{re.escape(name)}\s*$", doc, re.M):
+            continue
+        if re.search(r"^  memory:.*$", doc, re.M):
+            documents[i] = re.sub(r"^  memory:.*$", f"  memory: {quantity}", doc, count=1, flags=re.M)
+        else:
+            # Append to the end of the spec block
+            lines = doc.split("\n")
+            spec = lines.index("spec:")
+            end = next((j for j in range(spec + 1, len(lines)) if lines[j] and not lines[j].startswith(" ")), len(lines))
+            while end > spec + 1 and not lines[end - 1].strip():
+                end -= 1
+            lines.insert(end, f"  memory: {quantity}")
+            documents[i] = "\n".join(lines)
+    with open(path, "w") as f:
+        f.write("".join(documents))
+
+
+def build_report(models, profiles, args):
+    """Markdown report of recommendations and packing density"""
+    lines = [
+        "# Model Memory Right-Sizing Report",
+        "",
+        f"Generated {datetime.now().strftime('%Y-%m-%d %H:%M')} — headroom {args.headroom:.0%}, "
+        f"batch sizes {', '.join(map(str, args.batch_sizes))}, {args.requests} requests per batch size, "
+        f"{args.parallel_workers} MLServer parallel worker(s)",
+        "",
+        "| Model | Manifest | Load time | Idle | Load peak | Peak | Declared | Recommended |",
+        "|---|---|---|---|---|---|---|---|",
+    ]
+    for model in models:
+        profile = profiles.get(model["storage_uri"])
+        if not profile:
+            lines.append(f"| {model['name']} | {os.path.basename(model['path'])} | — | — | — | — | "
+                         f"{format_quantity(model['effective'])} | profiling failed |")
+            continue
+        declared = format_quantity(model["declared"]) if model["declared"] else f"unset ({format_quantity(model['effective'])})"
+        lines.append(
+            f"| {model['name']} | {os.path.basename(model['path'])} | {profile['load_time']:.1f}s | "
+            f"{profile['idle'] / MI:.0f}Mi | {profile['load_peak'] / MI:.0f}Mi | {profile['peak'] / MI:.0f}Mi | "
+            f"{declared} | {model['recommended']} |"
+        )
+
+    sized = [m for m in models if "recommended" in m]
+    if sized:
+        before = [m["effective"] for m in sized]
+        after = [parse_quantity(m["recommended"]) for m in sized]
+        nodes_before = nodes_needed(before, args.node_memory)
+        nodes_after = nodes_needed(after, args.node_memory)
+        per_node_before = args.node_memory // max(before)
+        per_node_after = args.node_memory // max(after)
+        lines += [
+            "",
+            f"## Packing Density ({format_quantity(args.node_memory)} per node)",
+            "",
+            "| | Declared | Recommended |",
+            "|---|---|---|",
+            f"| Total model memory | {format_quantity(sum(before))} | {format_quantity(sum(after))} |",
+            f"| Nodes needed for these models | {nodes_before} | {nodes_after} |",
+            f"| Replicas of the largest model per node | {per_node_before} | {per_node_after} |",
+            "",
+            f"**Density gained:** {sum(before) / sum(after):.1f}x more models per node "
+            f"({(1 - sum(after) / sum(before)) * 100:.0f}% less declared memory).",
+        ]
+        lines += ["", "## Peak Memory by Batch Size", ""]
+        for uri, profile in profiles.items():
+            if not profile:
+                continue
+            lines.append(f"- `{uri}`: load {profile['load_peak'] / MI:.0f}Mi, " + ", ".join(
+                f"batch {size}: {b['peak'] / MI:.0f}Mi ({b['success']}/{args.requests} ok)"
+                for size, b in profile["batches"].items()
+            ))
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--deployments", default=DEPLOYMENTS_DIR, help="Directory of Model manifests")
+    parser.add_argument("--models", default="", help="Comma-separated Model names (default: all)")
+    parser.add_argument("--batch-sizes", default="1,8,32,128", help="Comma-separated inference batch sizes")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per batch size")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent requests while profiling")
+    parser.add_argument("--features", type=int, default=4, help="Input feature width")
+    parser.add_argument("--min-success", type=float, default=0.95,
+                        help="Fraction of requests per batch size that must succeed to recommend a value")
+    parser.add_argument("--headroom", type=float, default=0.25, help="Fraction added on top of observed peak")
+    parser.add_argument("--step", default="16Mi", help="Round recommendations up to this quantity")
+    parser.add_argument("--default-memory", default="1Gi", help="Assumed memory for Models without a declaration")
+    parser.add_argument("--node-memory", default="16Gi", help="Server memory available per node for packing")
+    parser.add_argument("--parallel-workers", type=int, default=1,
+                        help="MLSERVER_PARALLEL_WORKERS for profiling (MLServer's default of 1 runs inference in a "
+                             "worker process holding its own model copy, as Seldon servers do)")
+    parser.add_argument("--report", default="memory_rightsizing_report.md", help="Markdown report path")
+    parser.add_argument("--write", action="store_true", help="Update memory values in the manifests")
+    args = parser.parse_args()
+    args.batch_sizes = [int(b) for b in args.batch_sizes.split(",")]
+    args.node_memory = parse_quantity(args.node_memory)
+    step = parse_quantity(args.step)
+
+    if shutil.which("mlserver") is None:
+        log("mlserver not found - install it with the runtimes your models need (e.g. pip install mlserver mlserver-sklearn)", "ERROR")
+        return 1
+
+    models = load_manifests(args.deployments, parse_quantity(args.default_memory))
+    if args.models:
+        wanted = set(args.models.split(","))
+        models = [m for m in models if m["name"] in wanted]
+    if not models:
+        log("No Model manifests found", "ERROR")
+        return 1
+    log(f"Found {len(models)} Model manifests using {len({m['storage_uri'] for m in models})} artifacts")
+
+    workdir = tempfile.mkdtemp(prefix="rightsize-")
+    profiles = {}
+    try:
+        baseline = profile_baseline(workdir, args)
+        log(f"Empty MLServer baseline: {baseline / MI:.0f}Mi")
+
+        # Models sharing an artifact and runtime have the same footprint; profile each artifact once
+        for model in models:
+            uri = model["storage_uri"]
+            if uri not in profiles:
+                try:
+                    artifact = fetch_artifact(uri, os.path.join(workdir, "artifacts"))
+                    profiles[uri] = profile_model(model, artifact, workdir, baseline, args)
+                    log(f"{model['name']}: loaded in {profiles[uri]['load_time']:.1f}s, "
+                        f"peak {profiles[uri]['peak'] / MI:.0f}Mi over baseline", "SUCCESS")
+                except Exception as e:
+                    profiles[uri] = None
+                    log(f"{model['name']}: profiling failed - {e}", "ERROR")
+            if profiles[uri]:
+                model["recommended"] = format_quantity(recommend(profiles[uri]["peak"], args.headroom, step))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = build_report(models, profiles, args)
+    with open(args.report, "w") as f:
+        f.write(report)
+    print(report)
+    log(f"Report saved to {args.report}", "SUCCESS")
+
+    if args.write:
+        for model in models:
+            if "recommended" in model:
+                write_memory(model["path"], model["name"], model["recommended"])
+                log(f"{os.path.basename(model['path'])}: {model['name']} memory -> {model['recommended']}", "SUCCESS")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
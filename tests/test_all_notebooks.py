@@ -10,8 +10,12 @@ import json
 import time
 import requests
 import sys
+import os
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "notebooks"))
+from client_metrics import client_metrics
+
 class SeldonNotebookTester:
     def __init__(self):
         self.namespace = "seldon-mesh"
@@ -113,11 +117,16 @@ class SeldonNotebookTester:
             }]
         }
         headers = {"Content-Type": "application/json", "Seldon-Model": model_name}
+        body = json.dumps(payload)
         
         try:
+            client_metrics.request_started(model_name)
             start_time = time.time()
-            response = requests.post(url, json=payload, headers=headers, timeout=30)
+            response = requests.post(url, data=body, headers=headers, timeout=30)
             latency = (time.time() - start_time) * 1000
+            client_metrics.request_finished(
+                model_name, latency / 1000, str(response.status_code), len(body), len(response.content)
+            )
             
             if response.status_code == 200:
                 self.test_results["models"][model_name] = {
@@ -134,6 +143,7 @@ class SeldonNotebookTester:
                 self.log(f"Model {model_name}: ❌ ({response.status_code})", "ERROR")
                 return False
         except Exception as e:
+            client_metrics.request_finished(model_name, time.time() - start_time, "error", len(body))
             self.test_results["models"][model_name] = {
                 "status": "error",
                 "error": str(e)
@@ -156,11 +166,16 @@ class SeldonNotebookTester:
             "Content-Type": "application/json",
             "Seldon-Model": f"{pipeline_name}.pipeline"
         }
+        body = json.dumps(payload)
         
         try:
+            client_metrics.request_started(headers["Seldon-Model"])
             start_time = time.time()
-            response = requests.post(url, json=payload, headers=headers, timeout=30)
+            response = requests.post(url, data=body, headers=headers, timeout=30)
             latency = (time.time() - start_time) * 1000
+            client_metrics.request_finished(
+                headers["Seldon-Model"], latency / 1000, str(response.status_code), len(body), len(response.content)
+            )
             
             if response.status_code == 200:
                 self.test_results["pipelines"][pipeline_name] = {
@@ -176,6 +191,7 @@ class SeldonNotebookTester:
                 self.log(f"Pipeline {pipeline_name}: ❌ ({response.status_code})", "ERROR")
                 return False
         except Exception as e:
+            client_metrics.request_finished(headers["Seldon-Model"], time.time() - start_time, "error", len(body))
             self.test_results["pipelines"][pipeline_name] = {
                 "status": "error",
                 "error": str(e)
@@ -274,15 +290,21 @@ class SeldonNotebookTester:
                 }]
             }
             
+            body = json.dumps(payload)
+            
             try:
+                client_metrics.request_started(test_model)
                 start_time = time.time()
-                response = requests.post(url, json=payload, headers={"Content-Type": "application/json"})
+                response = requests.post(url, data=body, headers={"Content-Type": "application/json"})
                 latency = (time.time() - start_time) * 1000
+                client_metrics.request_finished(
+                    test_model, latency / 1000, str(response.status_code), len(body), len(response.content)
+                )
                 
                 if response.status_code == 200:
                     latencies.append(latency)
             except:
-                pass
+                client_metrics.request_finished(test_model, time.time() - start_time, "error", len(body))
         
         if latencies:
             avg_latency = sum(latencies) / len(latencies)
@@ -326,6 +348,10 @@ class SeldonNotebookTester:
             json.dump(self.test_results, f, indent=2)
         self.log("Detailed report saved to test_report.json", "SUCCESS")
         
+        # Save client-side metrics in OpenMetrics format
+        client_metrics.dump("test_metrics.prom")
+        self.log("Client metrics saved to test_metrics.prom", "SUCCESS")
+        
         # Overall status
         overall_success = (infra_pass > infra_total * 0.8 and 
                           model_success > 0 and 